@@ -0,0 +1,196 @@
+# admin_rollups.py
+"""Incremental multi-user rollups for admin reporting.
+
+Usage:
+    python admin_rollups.py [--format parquet|csv] [--export-dir DIR] [--rebuild]
+
+Keeps a (User, Date, Sentiment) rollup of the journal store and only reads
+rows appended since the previous run. Summary tables are exported from the
+rollup, so their cost does not grow with the size of the journal.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+
+import pandas as pd
+
+from utils import DATA_PATH
+from auth_system import list_users
+
+ROLLUP_DIR = "data/rollups"
+ROLLUP_PATH = os.path.join(ROLLUP_DIR, "daily_user_sentiment.csv")
+STATE_PATH = os.path.join(ROLLUP_DIR, "state.json")
+UNASSIGNED_USER = "(unassigned)"
+
+ROLLUP_KEYS = ['User', 'Date', 'Sentiment']
+ROLLUP_COLUMNS = ROLLUP_KEYS + ['Entries', 'ScoreSum']
+SIGNATURE_BYTES = 256  # Bytes before the watermark checked to detect a rewritten store
+
+
+def _signature(f, offset):
+    f.seek(max(0, offset - SIGNATURE_BYTES))
+    return hashlib.sha1(f.read(offset - max(0, offset - SIGNATURE_BYTES))).hexdigest()
+
+
+def _load_state():
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    return None
+
+
+def _complete_length(chunk):
+    """Length of `chunk` up to the end of its last complete CSV record.
+
+    A record ends at a newline outside quotes; CSV quotes always come in
+    pairs, so that is a newline preceded by an even number of them.
+    """
+    quotes = chunk.count(b'"')
+    end = len(chunk)
+    while True:
+        newline = chunk.rfind(b'\n', 0, end)
+        if newline < 0:
+            return 0
+        quotes -= chunk.count(b'"', newline + 1, end)
+        if quotes % 2 == 0:
+            return newline + 1
+        end = newline
+
+
+def _read_new_rows(state):
+    """Rows appended to the store since `state`, plus the new state.
+
+    Falls back to reading everything if the header changed or the data
+    before the watermark no longer matches (e.g. the file was rewritten).
+    A row the app is still writing is left for the next run. Values are
+    read as written, so a username such as "NA" stays a username.
+    """
+    with open(DATA_PATH, 'rb') as f:
+        header_line = f.readline()
+        header = next(csv.reader([header_line.decode('utf-8')]))
+        size = os.fstat(f.fileno()).st_size
+
+        full = (
+            state is None
+            or state['header'] != header
+            or state['offset'] > size
+            or _signature(f, state['offset']) != state['signature']
+        )
+        offset = len(header_line) if full else state['offset']
+
+        f.seek(offset)
+        chunk = f.read(size - offset)
+        end = offset + _complete_length(chunk)
+        if end > offset:
+            new_rows = pd.read_csv(io.BytesIO(chunk[:end - offset]), header=None, names=header,
+                                   dtype={'User': str}, keep_default_na=False)
+        else:
+            new_rows = pd.DataFrame(columns=header)
+        new_state = {'header': header, 'offset': end, 'signature': _signature(f, end)}
+    return new_rows, full, new_state
+
+
+def _rollup(rows):
+    rows = rows.copy()
+    rows['Date'] = pd.to_datetime(rows['Date'], errors='coerce').dt.strftime("%Y-%m-%d")
+    rows['Score'] = pd.to_numeric(rows['Score'], errors='coerce')
+    rows['Sentiment'] = rows['Sentiment'].replace('', None)
+    rows = rows.dropna(subset=['Date', 'Score', 'Sentiment'])
+    if 'User' in rows.columns:
+        rows['User'] = rows['User'].fillna('').replace('', UNASSIGNED_USER)
+    else:
+        rows['User'] = UNASSIGNED_USER
+    return (rows.groupby(ROLLUP_KEYS)['Score']
+                .agg(Entries='count', ScoreSum='sum')
+                .reset_index())
+
+
+def update_rollups(rebuild=False):
+    """Fold newly appended journal rows into the rollup table and return it"""
+    os.makedirs(ROLLUP_DIR, exist_ok=True)
+    state = None if rebuild else _load_state()
+    if not os.path.exists(DATA_PATH):
+        return pd.DataFrame(columns=ROLLUP_COLUMNS), 0
+
+    new_rows, full, new_state = _read_new_rows(state)
+    rollup = _rollup(new_rows)
+    if not full and os.path.exists(ROLLUP_PATH):
+        existing = pd.read_csv(ROLLUP_PATH, keep_default_na=False, dtype={'User': str})
+        rollup = (pd.concat([existing, rollup], ignore_index=True)
+                    .groupby(ROLLUP_KEYS, as_index=False)[['Entries', 'ScoreSum']].sum())
+
+    rollup = rollup.sort_values(ROLLUP_KEYS)[ROLLUP_COLUMNS]
+    rollup.to_csv(ROLLUP_PATH, index=False)
+    with open(STATE_PATH, 'w') as f:
+        json.dump(new_state, f)
+    return rollup, len(new_rows)
+
+
+def build_summaries(rollup, users=()):
+    """Admin summary tables derived from the rollup"""
+    # Entries without an owner count towards the totals but not as a writer
+    writers = rollup['User'].where(rollup['User'] != UNASSIGNED_USER)
+    daily = (rollup.assign(User=writers).groupby('Date')
+                   .agg(ActiveWriters=('User', 'nunique'), Entries=('Entries', 'sum'),
+                        ScoreSum=('ScoreSum', 'sum'))
+                   .reset_index())
+    daily['AvgScore'] = daily['ScoreSum'] / daily['Entries']
+
+    moods = rollup.groupby('Sentiment', as_index=False)['Entries'].sum()
+    moods['Share'] = moods['Entries'] / moods['Entries'].sum()
+
+    per_user = (rollup.groupby('User')
+                      .agg(Entries=('Entries', 'sum'), ScoreSum=('ScoreSum', 'sum'),
+                           FirstDate=('Date', 'min'), LastDate=('Date', 'max'),
+                           ActiveDays=('Date', 'nunique'))
+                      .reindex(sorted(set(rollup['User']) | {str(user) for user in users})))
+    per_user['Entries'] = per_user['Entries'].fillna(0).astype(int)
+    per_user['AvgScore'] = per_user['ScoreSum'] / per_user['Entries'].where(per_user['Entries'] > 0)
+    per_user = per_user.rename_axis('User').reset_index()
+
+    return {
+        'daily_activity': daily.drop(columns='ScoreSum'),
+        'mood_distribution': moods,
+        'user_summary': per_user.drop(columns='ScoreSum'),
+    }
+
+
+def export_summaries(summaries, export_dir, fmt):
+    os.makedirs(export_dir, exist_ok=True)
+    paths = []
+    for name, table in summaries.items():
+        path = os.path.join(export_dir, f"{name}.{fmt}")
+        if fmt == 'parquet':
+            table.to_parquet(path, index=False)
+        else:
+            table.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def _default_format():
+    try:
+        import pyarrow  # noqa: F401
+        return 'parquet'
+    except ImportError:
+        return 'csv'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build incremental MoodMirror admin rollups")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default=_default_format(),
+                        help="Export format (default: parquet if pyarrow is installed, else csv)")
+    parser.add_argument('--export-dir', default=os.path.join(ROLLUP_DIR, "export"))
+    parser.add_argument('--rebuild', action='store_true', help="Ignore the watermark and re-read everything")
+    args = parser.parse_args()
+
+    rollup, n_new = update_rollups(rebuild=args.rebuild)
+    paths = export_summaries(build_summaries(rollup, list_users()), args.export_dir, args.format)
+    print(f"Processed {n_new} new row(s); wrote {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# anomaly_detection.py
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ALERTS_PATH = "data/mood_alerts.csv"
+STATE_DIR = "data/anomaly_state"  # One small state file per user
+
+EWMA_ALPHA = 0.1        # Weight of the newest day in the running mean/variance
+Z_THRESHOLD = -2.0      # Daily mean this many std-devs below the baseline
+MIN_DROP = 0.2          # ...and at least this far below it in raw score
+CUSUM_SLACK = 0.1       # Downward drift tolerated per day before CUSUM accumulates
+CUSUM_THRESHOLD = 1.0   # Accumulated downward drift that raises an alert
+MIN_DAYS = 7            # Days of history needed before any alert fires
+
+ALERT_COLUMNS = ['User', 'Date', 'Kind', 'Value', 'DetectedAt']
+
+
+def _new_state():
+    return {'day': None, 'day_sum': 0.0, 'day_count': 0,
+            'n_days': 0, 'mean': 0.0, 'var': 0.0, 'cusum': 0.0, 'alerted': []}
+
+
+def _check_day(state, x):
+    """Alert kinds raised by daily mean x against the baseline of earlier days"""
+    if state['n_days'] < MIN_DAYS:
+        return []
+    kinds = []
+    std = np.sqrt(state['var'])
+    z = (x - state['mean']) / std if std > 1e-6 else 0.0
+    if z <= Z_THRESHOLD and state['mean'] - x >= MIN_DROP:
+        kinds.append(('zscore', z))
+    cusum = max(0.0, state['cusum'] + (state['mean'] - x) - CUSUM_SLACK)
+    if cusum > CUSUM_THRESHOLD:
+        kinds.append(('cusum', cusum))
+    return kinds
+
+
+def _close_day(state):
+    """Fold the finished day into the EWMA baseline and CUSUM"""
+    x = state['day_sum'] / state['day_count']
+    if state['n_days'] == 0:
+        state['mean'], state['var'] = x, 0.0
+    else:
+        if 'cusum' in state['alerted']:
+            state['cusum'] = 0.0  # Start over once a drift has been reported
+        else:
+            state['cusum'] = max(0.0, state['cusum'] + (state['mean'] - x) - CUSUM_SLACK)
+        diff = x - state['mean']
+        incr = EWMA_ALPHA * diff
+        state['mean'] += incr
+        state['var'] = (1 - EWMA_ALPHA) * (state['var'] + diff * incr)
+    state['n_days'] += 1
+
+
+def update_state(state, date, score):
+    """Feed one entry into a user's detector state. O(1); returns new alerts."""
+    if state['day'] is not None and date < state['day']:
+        return []  # Backdated entries are left to the batch scan
+    if date != state['day']:
+        if state['day'] is not None:
+            _close_day(state)
+        state.update(day=date, day_sum=0.0, day_count=0, alerted=[])
+    state['day_sum'] += score
+    state['day_count'] += 1
+
+    alerts = []
+    for kind, value in _check_day(state, state['day_sum'] / state['day_count']):
+        if kind not in state['alerted']:
+            state['alerted'].append(kind)
+            alerts.append({'Date': date, 'Kind': kind, 'Value': round(float(value), 4)})
+    return alerts
+
+
+def _state_path(user):
+    # Hashed so any username maps to a safe file name
+    return os.path.join(STATE_DIR, hashlib.sha1(user.encode('utf-8')).hexdigest() + ".json")
+
+
+def _seed_state(user):
+    """Replay a user's saved entries into a fresh state.
+
+    Returns the state and the alerts raised by the last entry replayed.
+    """
+    from utils import load_entries
+
+    entries = load_entries()
+    entries = entries[entries['User'].fillna('') == user]
+    state, alerts = _new_state(), []
+    for date, score in zip(entries['Date'].dt.strftime("%Y-%m-%d"), entries['Score']):
+        alerts = update_state(state, date, float(score))
+    return state, alerts
+
+
+def record_entry(username, date, score):
+    """Run the streaming detector for an entry just saved and persist any alerts.
+
+    Only this user's state file is read and rewritten, so the cost does not
+    grow with the number of users. A user without one (first save since
+    the detector was deployed) is seeded from their saved history, which
+    already ends with this entry.
+    """
+    from utils import STORE_LOCK, atomic_write
+
+    user = username or ''
+    path = _state_path(user)
+    with STORE_LOCK:
+        state = None
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+            except ValueError:
+                print(f"Unreadable anomaly state {path}; rebuilding it from history")
+        if state is None:
+            state, alerts = _seed_state(user)
+        else:
+            alerts = update_state(state, date, float(score))
+
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump(state, f)
+        os.makedirs(STATE_DIR, exist_ok=True)
+        atomic_write(path, write)
+
+        if alerts:
+            save_alerts(pd.DataFrame([{'User': user, **a} for a in alerts]))
+    return alerts
+
+
+def save_alerts(alerts_df):
+    alerts_df = alerts_df.assign(DetectedAt=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    alerts_df = alerts_df[ALERT_COLUMNS]
+    alerts_df.to_csv(ALERTS_PATH, mode='a', index=False, header=not os.path.exists(ALERTS_PATH))
+
+
+def load_alerts(username=None):
+    if not os.path.exists(ALERTS_PATH):
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    alerts = pd.read_csv(ALERTS_PATH, keep_default_na=False, dtype={'User': str})
+    if username is not None:
+        alerts = alerts[alerts['User'] == username]
+    return alerts
+
+
+def scan_histories(df):
+    """Batch mode: run the detector over every user's full history at once.
+
+    Builds a users x days matrix of daily mean scores and steps all users
+    together, one vectorized update per day. Returns one row per alert.
+    """
+    df = df.dropna(subset=['Date', 'Score'])
+    if df.empty:
+        return pd.DataFrame(columns=['User', 'Date', 'Kind', 'Value'])
+    users = df['User'].fillna('').astype(str) if 'User' in df.columns else pd.Series('', index=df.index)
+    dates = pd.to_datetime(df['Date']).dt.strftime("%Y-%m-%d")
+    daily = df.assign(User=users, Date=dates).pivot_table(index='User', columns='Date', values='Score', aggfunc='mean')
+    daily = daily.reindex(sorted(daily.columns), axis=1)
+    matrix = daily.to_numpy(dtype=float)
+
+    n_users = matrix.shape[0]
+    mean = np.zeros(n_users)
+    var = np.zeros(n_users)
+    cusum = np.zeros(n_users)
+    n_days = np.zeros(n_users, dtype=int)
+    flags = []
+
+    for j in range(matrix.shape[1]):
+        x = matrix[:, j]
+        has = ~np.isnan(x)
+        ready = has & (n_days >= MIN_DAYS)
+
+        std = np.sqrt(var)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(std > 1e-6, (x - mean) / std, 0.0)
+        next_cusum = np.maximum(0.0, cusum + (mean - x) - CUSUM_SLACK)
+        cusum_hit = ready & (next_cusum > CUSUM_THRESHOLD)
+        for kind, hit, value in (('zscore', ready & (z <= Z_THRESHOLD) & (mean - x >= MIN_DROP), z),
+                                 ('cusum', cusum_hit, next_cusum)):
+            for i in np.flatnonzero(hit):
+                flags.append((daily.index[i], daily.columns[j], kind, round(float(value[i]), 4)))
+
+        first = has & (n_days == 0)
+        later = has & (n_days > 0)
+        # Start over once a drift has been reported, as the streaming detector does
+        cusum = np.where(later, np.where(cusum_hit, 0.0, next_cusum), cusum)
+        diff = x - mean
+        incr = EWMA_ALPHA * diff
+        var = np.where(later, (1 - EWMA_ALPHA) * (var + diff * incr), var)
+        mean = np.where(later, mean + incr, np.where(first, x, mean))
+        n_days = n_days + has
+
+    return pd.DataFrame(flags, columns=['User', 'Date', 'Kind', 'Value'])
+
+
+def main():
+    from utils import load_entries
+
+    parser = argparse.ArgumentParser(description="Scan all users' mood histories for dips")
+    parser.add_argument('--days', type=int, default=2,
+                        help="Persist alerts from the last N days, today included (default: 2, "
+                             "so a run just after midnight still covers the day that ended)")
+    args = parser.parse_args()
+
+    alerts = scan_histories(load_entries())
+    cutoff = (pd.Timestamp.today().normalize() - pd.Timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+    alerts = alerts[alerts['Date'] >= cutoff]
+
+    existing = load_alerts()
+    if not existing.empty:
+        seen = set(zip(existing['User'], existing['Date'], existing['Kind']))
+        alerts = alerts[[key not in seen for key in zip(alerts['User'], alerts['Date'], alerts['Kind'])]]
+    if not alerts.empty:
+        save_alerts(alerts)
+    print(f"Flagged {alerts['User'].nunique()} user(s), {len(alerts)} new alert(s)")
+
+
+if __name__ == "__main__":
+    main()
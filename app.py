@@ -1,17 +1,17 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from wordcloud import WordCloud
 from datetime import datetime
-from sentiment_analysis import analyze_sentiment_vader, get_keywords
-from utils import save_entry, load_entries
+from sentiment_analysis import analyze_sentiment_vader, get_keywords, extract_features, vader_scores
+from textblob import TextBlob
+from utils import save_entry, load_entries, get_keyword_ids
 import plotly.express as px 
 import random  
 from utils import export_to_pdf
 import streamlit as st
 import nltk
 import ssl
+import json
 import os
 from pathlib import Path
 from nltk_loader import loader  # This will ensure data is available
@@ -21,8 +21,15 @@ import numpy as np
 from statsmodels.tsa.arima.model import ARIMA
 from sklearn.preprocessing import MinMaxScaler
 from sleep_integration import show_sleep_analysis
+from anomaly_detection import load_alerts
+from migrations import start_background_migration
+from charts import show_wordcloud, score_line_chart, forecast_chart
+from charts import TIME_WINDOWS, FORECAST_HISTORY_DAYS, window_entries, downsample
 
 
+# Validate, repair and compact stored data once per process, off the request path
+start_background_migration()
+
 # Authentication check
 if "authenticated" not in st.session_state:
     show_auth()
@@ -63,15 +70,33 @@ except Exception as e:
 
 
 
-# Inject manifest and service worker
-st.markdown("""
-<link rel="manifest" href="/static/manifest.json">
+# Inject manifest, service worker and offline drafts.
+# Scripts in st.markdown are never executed, so this runs from a zero-height
+# component and acts on the parent (main app) window. Drafts are kept per
+# user, so the logged-in username is handed over on every run.
+draft_user = json.dumps(st.session_state.get("username", "")).replace("<", "\\u003c")
+components.html("""
 <script>
-  if ("serviceWorker" in navigator) {
-    navigator.serviceWorker.register("/static/service-worker.js")
+  const host = window.parent;
+  host.moodMirrorUser = %s;
+  if (!host.document.getElementById("moodmirror-manifest")) {
+    const manifest = host.document.createElement("link");
+    manifest.id = "moodmirror-manifest";
+    manifest.rel = "manifest";
+    manifest.href = "/app/static/manifest.json";
+    host.document.head.appendChild(manifest);
+
+    const draftQueue = host.document.createElement("script");
+    draftQueue.src = "/app/static/draft-queue.js";
+    host.document.head.appendChild(draftQueue);
+  }
+  if ("serviceWorker" in host.navigator) {
+    // Streamlit serves ./static under /app/static/, which also bounds the worker's scope;
+    // it does not control this page (see the note in service-worker.js)
+    host.navigator.serviceWorker.register("/app/static/service-worker.js", { scope: "/app/static/" });
   }
 </script>
-""", unsafe_allow_html=True)
+""" % draft_user, height=0)
 
 
 # Add cursor CSS immediately after
@@ -84,6 +109,19 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+def entry_date_from_query(value):
+    """Entry date from a restored draft's `entry_date` param, else today.
+
+    Only past or current YYYY-MM-DD dates are accepted.
+    """
+    today = datetime.now().date()
+    try:
+        date = datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return today.strftime("%Y-%m-%d")
+    return min(date, today).strftime("%Y-%m-%d")
+
 st.title("🧠 MoodMirror - AI Mental Health Journal")
 
 st.sidebar.header("Navigation")
@@ -96,11 +134,20 @@ if page == "New Entry":
 
 
     if st.button("Analyze and Save"):
+        # Drafts replayed by the offline queue carry the day they were written
+        entry_date = entry_date_from_query(st.query_params.get("entry_date"))
         if journal_text.strip() != "":
-            sentiment, score = analyze_sentiment_vader(journal_text)
-            keywords = get_keywords(journal_text)
-            save_entry(datetime.now().strftime("%Y-%m-%d"), journal_text, sentiment, score, keywords)
+            # Score once; the VADER breakdown and TextBlob are reused for the features
+            vader = vader_scores(journal_text)
+            blob = TextBlob(journal_text)
+            sentiment, score = analyze_sentiment_vader(journal_text, vader)
+            keywords = get_keywords(journal_text, blob)
+            features = extract_features(journal_text, get_keyword_ids(keywords), vader, blob)
+            alerts = save_entry(entry_date, journal_text, sentiment, score, keywords,
+                                features, username=st.session_state.get("username"))
             st.success(f"Entry saved! Detected sentiment: **{sentiment}** (Score: {score:.2f})")
+            if alerts:
+                st.warning("⚠️ Your mood today is noticeably lower than usual. Take care and prioritize self-care.")
         else:
             st.warning("Please write something before saving!")
 
@@ -110,34 +157,28 @@ elif page == "View Emotional Trends":
     df = load_entries()
     
     if not df.empty:
-        # Convert dates and sort
-        df['Date'] = pd.to_datetime(df['Date'])
+        # load_entries() already returns parsed, validated dates
         df = df.sort_values('Date')
-        
+
+        # Time window for the line charts; downsampled server-side to at most MAX_POINTS
+        window = st.selectbox("Time window", list(TIME_WINDOWS), index=1)
+        last_day = df['Date'].max()
+        history = window_entries(df, TIME_WINDOWS[window], pad_days=7, end=last_day)
+        window_df = window_entries(history, TIME_WINDOWS[window], end=last_day)
+
         # --- [1. LINE CHART] --- (Keep your existing time series plot)
-        fig_line = plt.figure(figsize=(10, 5))
-        sns.lineplot(x='Date', y='Score', data=df, marker='o')
-        plt.ylim(-1, 1)
-        plt.axhline(0, color='gray', linestyle='--')
-        st.pyplot(fig_line)
+        scores = downsample(window_df.set_index('Date')['Score'])
+        st.plotly_chart(score_line_chart(scores.index, scores.values), use_container_width=True)
 
          # --- [2. ROLLING AVERAGE LINE CHART] ---
         st.subheader("7-Day Rolling Average of Sentiment")
-        
-        # Convert 'Date' column to datetime
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
 
-        # Drop rows where 'Date' is NaT (invalid or missing)
-        df = df.dropna(subset=['Date'])
-
-        # Sort by date to ensure proper rolling behavior
-        df = df.sort_values('Date')
-
-        # Calculate 7-day rolling average
-        rolling_avg = df.set_index('Date')['Score'].rolling('7D').mean()
+        # Calculate 7-day rolling average, warmed up on the week before the window
+        rolling_avg = history.set_index('Date')['Score'].rolling('7D').mean()
+        rolling_avg = rolling_avg[rolling_avg.index >= window_df['Date'].min()]
 
         # Plot the rolling average
-        st.line_chart(rolling_avg, use_container_width=True)
+        st.line_chart(downsample(rolling_avg), use_container_width=True)
 
         
         # --- [3. NEW PIE CHART] ---
@@ -190,16 +231,12 @@ elif page == "WordCloud":
             filtered_df = df
 
         # Combine and clean entries
-        text_entries = filtered_df['Entry'].dropna().astype(str)
+        text_entries = filtered_df['Entry'].astype(str)
         text = " ".join(text_entries)
 
         if text.strip():  # ✅ Only generate if there's meaningful text
             # Generate and display the WordCloud
-            wordcloud = WordCloud(width=800, height=400, background_color='white').generate(text)
-            fig, ax = plt.subplots(figsize=(10, 5))
-            ax.imshow(wordcloud, interpolation='bilinear')
-            ax.axis('off')
-            st.pyplot(fig)
+            show_wordcloud(text)
         else:
             st.warning("⚠️ No valid text available for the selected sentiment to generate a WordCloud.")
 
@@ -247,7 +284,6 @@ elif page == "Mood Calendar":
 # Load and filter data - MODIFIED TO CALCULATE AVERAGE
     df = load_entries()
     if not df.empty:
-        df['Date'] = pd.to_datetime(df['Date'])
         # Group by date and calculate average score
         month_df = df[(df['Date'].dt.month == selected_month_num) & 
                      (df['Date'].dt.year == selected_year)]
@@ -407,35 +443,31 @@ elif page == "Advanced Mood Analytics":
         # Only continue if enough data is available
         if len(df) >= 14:  # At least 2 weeks of data for prediction
             # Prepare the data
-            df['Date'] = pd.to_datetime(df['Date'])
             forecast_df = df.groupby('Date')['Score'].mean().to_frame()
 
-            # Ensure daily frequency till today
+            # Daily series over a bounded history ending at the latest entry
             today = pd.Timestamp.today().normalize()
-            full_range = pd.date_range(start=forecast_df.index.min(), end=today)
+            last_day = forecast_df.index.max()
+            start = max(forecast_df.index.min(), last_day - pd.Timedelta(days=FORECAST_HISTORY_DAYS - 1))
+            forecast_df = forecast_df[forecast_df.index >= start]
+            full_range = pd.date_range(start=start, end=last_day)
             forecast_df = forecast_df.reindex(full_range)
-            forecast_df['Score'].interpolate(method='linear', inplace=True)
+            forecast_df['Score'] = forecast_df['Score'].interpolate(method='linear')
 
             # Fit ARIMA model
             model = ARIMA(forecast_df['Score'], order=(2, 1, 2))  # ARIMA(p,d,q)
             model_fit = model.fit()
 
-            # Forecast next 7 days from TODAY
-            forecast = model_fit.forecast(steps=7)
+            # Forecast next 7 days from TODAY, stepping over any days since the latest entry
+            gap_days = max((today - last_day).days, 0)
+            forecast = model_fit.forecast(steps=gap_days + 7)[-7:]
 
             # Generate dates from today+1 to today+7
             future_dates = pd.date_range(start=today + pd.Timedelta(days=1), periods=7)
 
             # Plot the forecast
-            fig_forecast = plt.figure(figsize=(10, 4))
-            plt.plot(forecast_df.index[-14:], forecast_df['Score'][-14:], label='Recent Sentiment')
-            plt.plot(future_dates, forecast, marker='o', linestyle='--', color='red', label='Forecast')
-            plt.axhline(0, color='gray', linestyle='--')
-            plt.title("Forecasted Mood Trend (Next 7 Days)")
-            plt.ylabel("Sentiment Score")
-            plt.xlabel("Date")
-            plt.legend()
-            st.pyplot(fig_forecast)
+            st.plotly_chart(forecast_chart(forecast_df['Score'][-14:], future_dates, forecast),
+                            use_container_width=True)
 
             # Mood Dip Warning
             if forecast.min() < -0.5:
@@ -445,6 +477,12 @@ elif page == "Advanced Mood Analytics":
         else:
             st.info("📉 Not enough data for prediction. Add more daily entries to enable forecasts.")
 
+        # Mood dips flagged by the anomaly detector
+        alerts = load_alerts(st.session_state.get("username", ""))
+        if not alerts.empty:
+            st.markdown("**Recent mood dip alerts**")
+            st.dataframe(alerts[['Date', 'Kind', 'Value']].tail(10), hide_index=True)
+
     
     # ===== 2. SLEEP/MOOD INTEGRATION =====
     st.markdown("---")
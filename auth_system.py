@@ -39,6 +39,16 @@ def verify_user(username, password):
         return result[0] == hashlib.sha256(password.encode()).hexdigest()
     return False
 
+# Registered usernames (for admin reporting)
+def list_users():
+    init_auth_db()
+    conn = sqlite3.connect('auth.db')
+    c = conn.cursor()
+    c.execute("SELECT username FROM users ORDER BY username")
+    users = [row[0] for row in c.fetchall()]
+    conn.close()
+    return users
+
 # Auth UI
 def show_auth():
     init_auth_db()
@@ -0,0 +1,99 @@
+# charts.py
+import io
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from wordcloud import WordCloud
+
+MAX_POINTS = 500  # Upper bound on points sent to the browser per series
+FORECAST_HISTORY_DAYS = 90  # Days of daily scores the mood forecast is fitted on
+
+TIME_WINDOWS = {
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last year": 365,
+    "All time": None,
+}
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _wordcloud_png(text):
+    # Cached on the text itself, so reruns with unchanged entries skip rendering
+    image = WordCloud(width=800, height=400, background_color='white').generate(text).to_image()
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def show_wordcloud(text):
+    """Render a WordCloud as a cached PNG, without going through matplotlib"""
+    st.image(_wordcloud_png(text), use_container_width=True)
+
+
+def score_line_chart(dates, scores):
+    """Sentiment score over time on a fixed -1..1 axis"""
+    fig = go.Figure(go.Scatter(x=dates, y=scores, mode='lines+markers', name='Score'))
+    fig.add_hline(y=0, line_dash='dash', line_color='gray')
+    fig.update_layout(yaxis_range=[-1, 1], xaxis_title='Date', yaxis_title='Score',
+                      margin=dict(l=0, r=0, t=10, b=0))
+    return fig
+
+
+def forecast_chart(recent, future_dates, forecast):
+    """Recent daily scores followed by the dashed forecast"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=recent.index, y=recent.values, mode='lines', name='Recent Sentiment'))
+    fig.add_trace(go.Scatter(x=future_dates, y=list(forecast), mode='lines+markers', name='Forecast',
+                             line=dict(color='red', dash='dash')))
+    fig.add_hline(y=0, line_dash='dash', line_color='gray')
+    fig.update_layout(title="Forecasted Mood Trend (Next 7 Days)",
+                      xaxis_title='Date', yaxis_title='Sentiment Score')
+    return fig
+
+
+# Windowing and downsampling
+def window_entries(df, days, pad_days=0, end=None):
+    """Entries dated within `days` days up to `end` (all entries if days is None).
+
+    `end` defaults to the latest entry, so a journal that has not been written
+    in a while still shows its last stretch. pad_days keeps extra history
+    before the window, e.g. to warm up a rolling mean.
+    """
+    if days is None or df.empty:
+        return df
+    end = df['Date'].max() if end is None else end
+    start = end - pd.Timedelta(days=days + pad_days - 1)
+    return df[df['Date'] >= start]
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points that keep the series' shape"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(int), n)
+
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        avg_x = x[edges[i + 1]:edges[i + 2]].mean()
+        avg_y = y[edges[i + 1]:edges[i + 2]].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(series, max_points=MAX_POINTS):
+    """Datetime-indexed series reduced to at most max_points with LTTB"""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    keep = lttb(series.index.asi8, series.values, max_points)
+    return series.iloc[keep]
@@ -0,0 +1,166 @@
+# migrations.py
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import (DATA_PATH, FEATURES_PATH, ENTRY_COLUMNS, FEATURE_NAMES, STORE_LOCK,
+                   atomic_write, read_feature_rows)
+
+SCHEMA_PATH = "data/schema.json"
+SCHEMA_VERSION = 2
+
+# Old databases no code reads any more; moved aside rather than deleted.
+# Stores rewritten by a migration are also copied here first.
+LEGACY_DATABASES = ["users.db", "user_data.db"]
+LEGACY_DIR = "data/legacy"
+
+_background = None
+
+
+def current_version():
+    if not os.path.exists(SCHEMA_PATH):
+        return 0
+    with open(SCHEMA_PATH) as f:
+        return json.load(f).get('version', 0)
+
+
+def is_current():
+    return current_version() >= SCHEMA_VERSION
+
+
+def _write_version(version):
+    def write(path):
+        with open(path, 'w') as f:
+            json.dump({'version': version}, f)
+    atomic_write(SCHEMA_PATH, write)
+
+
+def repair_entries(df):
+    """Coerce a raw journal frame to the current schema.
+
+    Returns the repaired frame and a boolean mask of the input rows kept.
+    """
+    df = df.loc[:, ~df.columns.astype(str).str.startswith('Unnamed')].copy()
+    for column in ENTRY_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    # format='mixed' parses each value on its own rather than inferring one
+    # format from the first row, so dates written in other styles survive
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce', format='mixed').dt.normalize()
+    df['Score'] = pd.to_numeric(df['Score'], errors='coerce')
+    keep = (df['Date'].notna() & df['Score'].notna() & df['Entry'].notna()).to_numpy()
+    return df.loc[keep, ENTRY_COLUMNS].reset_index(drop=True), keep
+
+
+def _backup_path(path, version):
+    name, ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(LEGACY_DIR, f"{name}.v{version}{ext}")
+
+
+def _backup(path, backup):
+    """Copy a store into LEGACY_DIR before a migration rewrites it.
+
+    An existing backup is never overwritten: it holds the original that a
+    rerun of an interrupted migration starts from.
+    """
+    if os.path.exists(path) and not os.path.exists(backup):
+        os.makedirs(LEGACY_DIR, exist_ok=True)
+        atomic_write(backup, lambda tmp_path: shutil.copy2(path, tmp_path))
+
+
+def _v1_repair_and_compact():
+    """Canonical columns, no blank or invalid rows, one feature row per entry.
+
+    Both outputs are derived from the v0 backups, so if the process dies
+    before the version is written, the rerun repeats the same work from the
+    same originals instead of compacting already-compacted files.
+    """
+    os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
+    n_features = len(FEATURE_NAMES)
+    csv_backup = _backup_path(DATA_PATH, 0)
+    features_backup = _backup_path(FEATURES_PATH, 0)
+    # The CSV backup is taken last, so once it exists both originals are saved
+    if not os.path.exists(csv_backup):
+        _backup(FEATURES_PATH, features_backup)
+        _backup(DATA_PATH, csv_backup)
+
+    if os.path.exists(csv_backup):
+        raw = pd.read_csv(csv_backup, dtype={'User': str})
+        entries, keep = repair_entries(raw)
+        print(f"Storage migration v1: kept {len(entries)} entries, dropped {len(raw) - len(entries)} "
+              f"blank or invalid row(s); originals copied to {LEGACY_DIR}/")
+
+        # Feature rows are positional, so they are compacted with the same mask
+        features = np.full((len(raw), n_features), np.nan, dtype=np.float32)
+        if os.path.exists(features_backup):
+            stored = read_feature_rows(features_backup)[:len(raw)]
+            features[:len(stored)] = stored
+        features = features[keep]
+
+        atomic_write(DATA_PATH, lambda path: entries.to_csv(path, index=False, date_format="%Y-%m-%d"))
+        atomic_write(FEATURES_PATH, features.tofile)
+    elif os.path.exists(FEATURES_PATH):
+        os.remove(FEATURES_PATH)
+
+    for db in LEGACY_DATABASES:
+        if os.path.exists(db):
+            os.makedirs(LEGACY_DIR, exist_ok=True)
+            shutil.move(db, os.path.join(LEGACY_DIR, db))
+
+
+def _v2_backfill_features():
+    """Score entries saved before features existed, so analytics never re-read text"""
+    # The NLP stack is only needed for this one-off pass
+    from sentiment_analysis import extract_features
+    from utils import get_keyword_ids
+
+    if not os.path.exists(DATA_PATH):
+        return
+    entries = pd.read_csv(DATA_PATH, dtype={'User': str, 'Entry': str, 'Keywords': str})
+    n_features = len(FEATURE_NAMES)
+    features = np.full((len(entries), n_features), np.nan, dtype=np.float32)
+    if os.path.exists(FEATURES_PATH):
+        stored = read_feature_rows()[:len(entries)]
+        features[:len(stored)] = stored
+    missing = np.flatnonzero(np.isnan(features).all(axis=1))
+    if not len(missing):
+        return
+
+    # Keywords as they were saved with each entry, registered in one vocab write
+    keywords = [[k for k in str(entries.at[i, 'Keywords']).split(', ') if k]
+                if pd.notna(entries.at[i, 'Keywords']) else [] for i in missing]
+    ids = iter(get_keyword_ids([k for row in keywords for k in row]))
+    for i, row in zip(missing, keywords):
+        features[i] = extract_features(str(entries.at[i, 'Entry']), [next(ids) for _ in row])
+    atomic_write(FEATURES_PATH, features.tofile)
+    print(f"Storage migration v2: backfilled features for {len(missing)} entries")
+
+
+MIGRATIONS = [
+    (1, _v1_repair_and_compact),
+    (2, _v2_backfill_features),
+]
+
+
+def run_migrations():
+    """Bring the store up to SCHEMA_VERSION. Cheap no-op once it is current."""
+    with STORE_LOCK:
+        version = current_version()
+        for target, migrate in MIGRATIONS:
+            if version < target:
+                migrate()
+                _write_version(target)
+                version = target
+
+
+def start_background_migration():
+    """Run pending migrations once per process on a daemon thread"""
+    global _background
+    if _background is None and not is_current():
+        _background = threading.Thread(target=run_migrations, name="storage-migration", daemon=True)
+        _background.start()
+    return _background
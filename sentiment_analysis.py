@@ -4,6 +4,8 @@ import nltk
 import plotly.express as px
 import random
 import os
+import numpy as np
+from utils import MAX_KEYWORD_IDS
 
 # Set NLTK data path to a writable directory
 nltk_data_path = os.path.join(os.path.expanduser("~"), "nltk_data")
@@ -20,8 +22,12 @@ except Exception as e:
 
 analyzer = SentimentIntensityAnalyzer()
 
-def analyze_sentiment_vader(text):
-    score = analyzer.polarity_scores(text)
+def vader_scores(text):
+    """Full VADER breakdown (neg/neu/pos/compound), reusable across the helpers below"""
+    return analyzer.polarity_scores(text)
+
+def analyze_sentiment_vader(text, scores=None):
+    score = scores if scores is not None else analyzer.polarity_scores(text)
     sentiment = 'Neutral'
     if score['compound'] >= 0.05:
         sentiment = 'Positive'
@@ -39,11 +45,28 @@ def analyze_sentiment_textblob(text):
         sentiment = 'Negative'
     return sentiment, polarity
 
-def get_keywords(text):
+def get_keywords(text, blob=None):
     try:
-        blob = TextBlob(text)
+        blob = blob if blob is not None else TextBlob(text)
         return blob.noun_phrases
     except:
         # Fallback to simple keyword extraction
         words = [word.lower() for word in text.split() if len(word) > 3]
         return list(set(words))[:5]  # Return first 5 unique words
+
+def extract_features(text, keyword_ids=(), vader=None, blob=None):
+    """Compact float32 feature vector for one entry (layout: utils.FEATURE_NAMES).
+
+    Pass the VADER scores and TextBlob already computed for the entry to avoid
+    scoring the text twice. Unused keyword slots are filled with -1.
+    """
+    vader = vader if vader is not None else analyzer.polarity_scores(text)
+    blob = blob if blob is not None else TextBlob(text)
+    ids = list(keyword_ids)[:MAX_KEYWORD_IDS]
+    ids += [-1] * (MAX_KEYWORD_IDS - len(ids))
+    return np.array([
+        vader['neg'], vader['neu'], vader['pos'], vader['compound'],
+        blob.sentiment.polarity, blob.sentiment.subjectivity,
+        len(text), len(text.split()),
+        *ids
+    ], dtype=np.float32)
@@ -36,6 +36,7 @@ def show_sleep_analysis():
         st.markdown("_We analyze if there's a connection between your sleep and mood._")
 
         # Merge on date
+        sleep_df = sleep_df.assign(Date=pd.to_datetime(sleep_df['Date']))
         combined = pd.merge(mood_df, sleep_df, on="Date", how="inner")
 
         if not combined.empty:
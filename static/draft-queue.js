@@ -0,0 +1,132 @@
+// Offline drafts for the "New Entry" page.
+// Loaded into the main Streamlit page by app.py, which sets
+// window.moodMirrorUser to the logged-in username on every run. The journal
+// text is autosaved to localStorage per user as it is typed, with the day it
+// was started. Streamlit disables its widgets once its websocket drops, so
+// nothing can be saved while offline. The next time the New Entry page is
+// rendered for the same user, the unsent draft is put back in the text box
+// for them to review and save themselves; the save uses the draft's original
+// date via the `entry_date` query param. Nothing is ever submitted on the
+// user's behalf, and Logout discards the draft.
+(function () {
+  if (window.moodMirrorDrafts) {
+    return;
+  }
+
+  const DRAFT_PREFIX = "moodmirror-draft:";
+  const DATE_PARAM = "entry_date";
+  const TEXTAREA = "textarea[aria-label=\"Today's Thoughts...\"]";
+  const SAVE_LABEL = "Analyze and Save";
+  const LOGOUT_LABEL = "Logout";
+  const NOTE_ID = "moodmirror-draft-note";
+
+  function draftKey() {
+    return window.moodMirrorUser ? DRAFT_PREFIX + window.moodMirrorUser : null;
+  }
+
+  function readDraft() {
+    const key = draftKey();
+    try {
+      return key ? JSON.parse(localStorage.getItem(key)) : null;
+    } catch (e) {
+      return null;
+    }
+  }
+
+  function clearDraft() {
+    const key = draftKey();
+    if (key) {
+      localStorage.removeItem(key);
+    }
+  }
+
+  // Local calendar day, matching the server's datetime.now() date
+  function today() {
+    const now = new Date();
+    const pad = function (n) { return String(n).padStart(2, "0"); };
+    return `${now.getFullYear()}-${pad(now.getMonth() + 1)}-${pad(now.getDate())}`;
+  }
+
+  function buttonLabel(event) {
+    const button = event.target.closest && event.target.closest("button");
+    return button ? button.innerText.trim() : null;
+  }
+
+  function setDateParam(date) {
+    const url = new URL(window.location.href);
+    if (date && date !== today()) {
+      url.searchParams.set(DATE_PARAM, date);
+    } else {
+      url.searchParams.delete(DATE_PARAM);
+    }
+    window.history.replaceState(window.history.state, "", url);
+  }
+
+  // Set a React-controlled textarea's value so Streamlit picks it up
+  function setText(textarea, text) {
+    const setter = Object.getOwnPropertyDescriptor(HTMLTextAreaElement.prototype, "value").set;
+    setter.call(textarea, text);
+    textarea.dispatchEvent(new Event("input", { bubbles: true }));
+    textarea.focus();
+    textarea.blur();  // Streamlit commits text_area values on blur
+  }
+
+  function showNote(textarea, date) {
+    if (document.getElementById(NOTE_ID)) {
+      return;
+    }
+    const note = document.createElement("p");
+    note.id = NOTE_ID;
+    note.style.fontSize = "0.85em";
+    note.style.opacity = "0.7";
+    note.textContent = `Restored your unsent draft from ${date}. Review it and click "${SAVE_LABEL}" to keep it.`;
+    (textarea.closest("[data-testid='stTextArea']") || textarea).before(note);
+  }
+
+  // Autosave the current user's text; a draft keeps the day it was started
+  document.addEventListener("input", function (event) {
+    const key = draftKey();
+    if (!key || !event.target.matches || !event.target.matches(TEXTAREA)) {
+      return;
+    }
+    const text = event.target.value;
+    if (!text.trim()) {
+      clearDraft();
+      setDateParam(null);
+      return;
+    }
+    const draft = readDraft();
+    const date = draft && draft.date ? draft.date : today();
+    localStorage.setItem(key, JSON.stringify({ text: text, date: date }));
+  }, true);
+
+  document.addEventListener("click", function (event) {
+    const label = buttonLabel(event);
+    if (label === SAVE_LABEL) {
+      // The rerun has already picked up the date param by the time it is cleared
+      clearDraft();
+      setTimeout(function () { setDateParam(null); }, 1000);
+    } else if (label === LOGOUT_LABEL) {
+      clearDraft();
+      setDateParam(null);
+      window.moodMirrorUser = null;
+    }
+  }, true);
+
+  // Offer the unsent draft when the New Entry page is rendered
+  new MutationObserver(function () {
+    const textarea = document.querySelector(TEXTAREA);
+    if (!textarea || textarea.dataset.draftChecked || !draftKey()) {
+      return;
+    }
+    textarea.dataset.draftChecked = "1";
+    const draft = readDraft();
+    if (draft && draft.text && !textarea.value) {
+      setDateParam(draft.date);
+      setText(textarea, draft.text);
+      showNote(textarea, draft.date);
+    }
+  }).observe(document.body, { childList: true, subtree: true });
+
+  window.moodMirrorDrafts = { clear: clearDraft };
+})();
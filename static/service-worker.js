@@ -1,7 +1,33 @@
-self.addEventListener("install", function (event) {
-  console.log("Service Worker installing.");
+// MoodMirror service worker
+//
+// Streamlit serves ./static at /app/static/ (server.enableStaticServing) and
+// cannot serve files from "/" or send a Service-Worker-Allowed header. This
+// worker is therefore scoped to /app/static/ and does NOT control the app
+// page, which lives at "/". It cannot cache the page, Streamlit's /static/
+// bundles or its websocket traffic, and it provides no offline support or
+// Background Sync. It is registered only so the app is installable with its
+// manifest, and it removes caches left by earlier versions of this file.
+//
+// Caching the page and its bundles for faster repeat visits needs a reverse
+// proxy in front of Streamlit that serves this file at /service-worker.js
+// (or adds Service-Worker-Allowed: /) so it can be registered with scope "/".
+
+self.addEventListener("install", function () {
+  self.skipWaiting();
 });
 
-self.addEventListener("fetch", function (event) {
-  event.respondWith(fetch(event.request));
+self.addEventListener("activate", function (event) {
+  event.waitUntil(
+    caches.keys().then(function (keys) {
+      return Promise.all(
+        keys
+          .filter(function (key) {
+            return key.startsWith("moodmirror-");
+          })
+          .map(function (key) {
+            return caches.delete(key);
+          })
+      );
+    })
+  );
 });
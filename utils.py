@@ -1,25 +1,150 @@
 import pandas as pd
+import numpy as np
+import json
 import os
+import threading
 
 DATA_PATH = "data/journal_entries.csv"
+FEATURES_PATH = "data/entry_features.f32"
+KEYWORD_VOCAB_PATH = "data/keyword_vocab.json"
+ENTRY_COUNT_PATH = "data/entry_count.json"  # Row count of DATA_PATH, kept by save_entry
+ENTRY_COLUMNS = ['Date', 'User', 'Entry', 'Sentiment', 'Score', 'Keywords']
+
+# Per-entry feature vector layout (stored as float32 in FEATURES_PATH)
+MAX_KEYWORD_IDS = 5
+FEATURE_NAMES = [
+    'vader_neg', 'vader_neu', 'vader_pos', 'vader_compound',
+    'textblob_polarity', 'textblob_subjectivity',
+    'char_count', 'word_count',
+] + [f'keyword_id_{i}' for i in range(MAX_KEYWORD_IDS)]
+
+# Held by every read-modify-write of the files under data/ (saves, the
+# keyword vocab, migrations), so concurrent sessions cannot interleave.
+STORE_LOCK = threading.RLock()
+
+def atomic_write(path, write):
+    """Call write(tmp_path), then swap the result into place"""
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
 
 def load_entries():
-    if os.path.exists(DATA_PATH):
-        return pd.read_csv(DATA_PATH)
-    else:
-        return pd.DataFrame(columns=['Date', 'Entry', 'Sentiment', 'Score', 'Keywords'])
+    """Journal entries with parsed dates and no blank or invalid rows"""
+    from migrations import is_current, repair_entries
+
+    if not os.path.exists(DATA_PATH):
+        return pd.DataFrame(columns=ENTRY_COLUMNS)
+    if is_current():
+        return pd.read_csv(DATA_PATH, parse_dates=['Date'], dtype={'User': str})
+    # Store not migrated yet: repair in memory until the migration lands
+    return repair_entries(pd.read_csv(DATA_PATH, dtype={'User': str}))[0]
+
+def save_entry(date, entry, sentiment, score, keywords, features=None, username=None):
+    from anomaly_detection import record_entry
+    from migrations import run_migrations
 
-def save_entry(date, entry, sentiment, score, keywords):
-    df = load_entries()
     new_entry = pd.DataFrame({
         'Date': [date],
+        'User': [username],
         'Entry': [entry],
         'Sentiment': [sentiment],
         'Score': [score],
         'Keywords': [', '.join(keywords)]
     })
-    df = pd.concat([df, new_entry], ignore_index=True)
-    df.to_csv(DATA_PATH, index=False) 
+    # One save at a time, so the CSV row, its feature row and the detector
+    # state of concurrent sessions cannot interleave
+    with STORE_LOCK:
+        run_migrations()  # Appends below rely on the current schema
+        row_index = _entry_count()
+        new_entry.to_csv(DATA_PATH, mode='a', index=False, header=not os.path.exists(DATA_PATH))
+        _write_entry_count(row_index + 1)
+        append_features(features, row_index)
+        return record_entry(username, date, score)
+
+def _entry_count():
+    """Rows in DATA_PATH without reading it, while the kept count still matches the file"""
+    if not os.path.exists(DATA_PATH):
+        return 0
+    size = os.path.getsize(DATA_PATH)
+    try:
+        with open(ENTRY_COUNT_PATH) as f:
+            count = json.load(f)
+        if count['csv_bytes'] == size:
+            return count['rows']
+    except (OSError, ValueError, KeyError):
+        pass
+    # Written by something else (a migration, an interrupted save): count once
+    return len(pd.read_csv(DATA_PATH, usecols=[0]))
+
+def _write_entry_count(rows):
+    def write(path):
+        with open(path, 'w') as f:
+            json.dump({'rows': rows, 'csv_bytes': os.path.getsize(DATA_PATH)}, f)
+    atomic_write(ENTRY_COUNT_PATH, write)
+
+
+# Precomputed per-entry features
+def get_keyword_ids(keywords):
+    """Map keywords to stable integer ids, registering unseen ones"""
+    with STORE_LOCK:
+        vocab = {}
+        if os.path.exists(KEYWORD_VOCAB_PATH):
+            with open(KEYWORD_VOCAB_PATH) as f:
+                vocab = json.load(f)
+        n_known = len(vocab)
+        ids = []
+        for keyword in keywords:
+            if keyword not in vocab:
+                vocab[keyword] = len(vocab)
+            ids.append(vocab[keyword])
+        if len(vocab) > n_known:
+            def write(path):
+                with open(path, 'w') as f:
+                    json.dump(vocab, f)
+            atomic_write(KEYWORD_VOCAB_PATH, write)
+    return ids
+
+def read_feature_rows(path=FEATURES_PATH):
+    """Stored feature rows, ignoring a partial row left by an interrupted write"""
+    width = len(FEATURE_NAMES)
+    stored = np.fromfile(path, dtype=np.float32)
+    return stored[:len(stored) // width * width].reshape(-1, width)
+
+def load_features():
+    """Feature matrix aligned row-for-row with load_entries().
+
+    Rows saved before features existed are NaN until migration v2 has
+    backfilled them.
+    """
+    from migrations import is_current, repair_entries
+
+    if not os.path.exists(DATA_PATH):
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32)
+    # Before migration, feature rows line up with the raw (unrepaired) rows
+    keep = None if is_current() else repair_entries(pd.read_csv(DATA_PATH))[1]
+    n_rows = len(load_entries()) if keep is None else len(keep)
+    features = np.full((n_rows, len(FEATURE_NAMES)), np.nan, dtype=np.float32)
+    if os.path.exists(FEATURES_PATH):
+        stored = read_feature_rows()
+        features[:len(stored)] = stored[:n_rows]
+    return features if keep is None else features[keep]
+
+def append_features(vector, row_index):
+    """Write the feature row for the entry at `row_index` of DATA_PATH.
+
+    Entries saved without features are NaN-padded and stray or partial
+    rows left by an interrupted save are truncated, so one missed write
+    cannot shift later rows onto the wrong entries.
+    """
+    width = len(FEATURE_NAMES)
+    if vector is None:
+        vector = np.full(width, np.nan)
+    row_bytes = width * 4
+    stored_rows = os.path.getsize(FEATURES_PATH) // row_bytes if os.path.exists(FEATURES_PATH) else 0
+    with open(FEATURES_PATH, 'ab') as f:
+        f.truncate(min(stored_rows, row_index) * row_bytes)
+        np.full((max(row_index - stored_rows, 0), width), np.nan, dtype=np.float32).tofile(f)
+        np.asarray(vector, dtype=np.float32).tofile(f)
 
 
 # pdf export
@@ -48,7 +173,7 @@ def export_to_pdf(df):
     else:
         for _, row in df.iterrows():
             pdf.set_font('DejaVu', 'B', 10)
-            pdf.cell(0, 6, f"Date: {row['Date']}", 0, 1)
+            pdf.cell(0, 6, f"Date: {row['Date']:%Y-%m-%d}", 0, 1)
 
             pdf.set_font('DejaVu', '', 10)
             mood = str(row['Sentiment'])